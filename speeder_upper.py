@@ -2,207 +2,288 @@
 """ Formatted with yapf """
 
 import argparse
+import collections
 import json
 import sys
 import os
-import re
 import glob
+import functools
+import subprocess
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from fractions import Fraction
 from pathlib import Path
 from filelock import Timeout, FileLock
 import yt_dlp
 import requests
+from requests.adapters import HTTPAdapter
 import ffmpeg
 
 MAX_RETRIES = 5
+RETRY_BACKOFF_SECONDS = 1
 MAX_HEIGHT = 1080
 MAX_WIDTH = 1920
 MAX_INPUT_FRAME_RATE = 60
 MAX_OUTPUT_FRAME_RATE = 60
 FILE_NAME_TEMPLATE = "%(id)s"
 SPEED_FACTOR = 2.50
+DEFAULT_ENCODE_JOBS = 3
+FRAGMENT_DOWNLOAD_THREADS = 8
 
 BLOCKED_CATEGORIES = ["sponsor", "selfpromo"]
+BLOCKED_CATEGORIES_JSON = json.dumps(BLOCKED_CATEGORIES)
 
-allowed_chars_pattern = re.compile(r"[^\w\s-]+")
+
+class FilenameCharTable(dict):
+    """str.translate table that drops anything but word characters, spaces and -"""
+
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        allowed = char.isalnum() or char.isspace() or char in "_-"
+        self[codepoint] = codepoint if allowed else None
+        return self[codepoint]
+
+
+filename_char_table = FilenameCharTable()
 
 DOWNLOAD_LOCK_PATH = "ytdl_download.lock"
-download_lock = FileLock(DOWNLOAD_LOCK_PATH, timeout=1)
+download_lock = FileLock(DOWNLOAD_LOCK_PATH, timeout=1, thread_local=False)
 ENCODE_LOCK_PATH = "ytdl_encode.lock"
 encode_lock = FileLock(ENCODE_LOCK_PATH, timeout=1)
+PROBE_CACHE_PATH = "ytdl_probe_cache.json"
+SPONSOR_CACHE_PATH = "ytdl_sponsor_cache.json"
+DEARROW_CACHE_PATH = "ytdl_dearrow_cache.json"
+API_CACHE_TTL = 24 * 60 * 60
+
+HTTP_WORKERS = 16
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_WORKERS))
+
+NVENC_CODECS = {"hevc_nvenc", "av1_nvenc"}
+# Software encoders that already spread one encode across several cores
+CPU_CODECS = {"x264", "x265", "svt_hevc", "av1"}
+CPU_CORES_PER_ENCODE = 4
+# NVENC encodes to run per card; each also decodes on the same card's NVDEC
+NVENC_SESSIONS_PER_GPU = 3
+gpu_lock = threading.Lock()
+gpu_job_counts = collections.Counter()
+
+
+HEVC_NVENC_ARGS = {
+    "format": "mp4",
+    "vcodec": "hevc_nvenc",
+    "g": "600",
+    "bf": "3",
+    "b_ref_mode": "middle",
+    "rc-lookahead": "32",
+    "spatial-aq": "1",
+    "temporal-aq": "1",
+    "aq-strength": "8",
+    "preset": "p5",
+    "tune": "hq",
+    "cq": "20",
+    "vprofile": "main10",
+    "rc": "vbr",
+    "vtag": "hvc1",
+    "acodec": "libfdk_aac",
+    "audio_bitrate": "128k",
+    "movflags": "+faststart",
+    "metadata:s:a:0": "language=eng",
+}
 
 
-def codec_hevc_nvenc(v1, a1, tmp_file, framerate):
-    """Use an NVIDIA GPU to encode to H.265"""
+def codec_hevc_nvenc(v1, a1, tmp_file, framerate, **extra_args):
+    """Use an NVIDIA GPU to encode 10-bit CUDA frames to H.265"""
     return ffmpeg.output(
-        v1,
-        a1,
-        tmp_file,
-        format="mp4",
-        pix_fmt="p010le",
-        vcodec="hevc_nvenc",
-        g="600",
-        preset="p7",
-        cq="20",
-        vprofile="main10",
-        rc="vbr",
-        vtag="hvc1",
-        acodec="libfdk_aac",
-        audio_bitrate="128k",
-        movflags="+faststart",
-        r=framerate,
-        **{
-            "metadata:s:a:0": "language=eng",
-        },
+        v1, a1, tmp_file, r=framerate, **{**HEVC_NVENC_ARGS, **extra_args}
     )
 
 
-def codec_hevc_qsv(v1, a1, tmp_file, framerate):
+HEVC_QSV_ARGS = {
+    "format": "mp4",
+    "pix_fmt": "p010le",
+    "vcodec": "hevc_qsv",
+    "preset": "slower",
+    "global_quality": "19",
+    "g": "600",
+    "forced_idr": "1",
+    "vprofile": "main10",
+    "vtag": "hvc1",
+    "acodec": "libfdk_aac",
+    "audio_bitrate": "128k",
+    "movflags": "+faststart",
+    "metadata:s:a:0": "language=eng",
+}
+
+
+def codec_hevc_qsv(v1, a1, tmp_file, framerate, **extra_args):
     """Use an Intel CPU/GPU to encode to H.265"""
     return ffmpeg.output(
-        v1,
-        a1,
-        tmp_file,
-        format="mp4",
-        pix_fmt="p010le",
-        vcodec="hevc_qsv",
-        preset="slower",
-        global_quality="19",
-        g="600",
-        forced_idr="1",
-        vprofile="main10",
-        vtag="hvc1",
-        acodec="libfdk_aac",
-        audio_bitrate="128k",
-        movflags="+faststart",
-        r=framerate,
-        **{
-            "metadata:s:a:0": "language=eng",
-        },
+        v1, a1, tmp_file, r=framerate, **{**HEVC_QSV_ARGS, **extra_args}
     )
 
 
-def codec_av1_nvenc(v1, a1, tmp_file, framerate):
-    """Use an NVIDIA GPU to encode to AV1"""
+AV1_NVENC_ARGS = {
+    "format": "mp4",
+    "vcodec": "av1_nvenc",
+    "g": "600",
+    "bf": "3",
+    "b_ref_mode": "middle",
+    "rc-lookahead": "32",
+    "spatial-aq": "1",
+    "temporal-aq": "1",
+    "aq-strength": "8",
+    "multipass": "qres",
+    "video_bitrate": "0",
+    "preset": "p5",
+    "tune": "hq",
+    "cq": "28",
+    "vprofile": "main10",
+    "rc": "vbr",
+    "acodec": "libfdk_aac",
+    "audio_bitrate": "128k",
+    "movflags": "+faststart",
+    "metadata:s:a:0": "language=eng",
+}
+
+
+def codec_av1_nvenc(v1, a1, tmp_file, framerate, **extra_args):
+    """Use an NVIDIA GPU to encode 10-bit CUDA frames to AV1"""
     return ffmpeg.output(
-        v1,
-        a1,
-        tmp_file,
-        format="mp4",
-        pix_fmt="p010le",
-        vcodec="av1_nvenc",
-        multipass="qres",
-        video_bitrate="0",
-        preset="p7",
-        cq="28",
-        vprofile="main10",
-        rc="vbr",
-        acodec="libfdk_aac",
-        audio_bitrate="128k",
-        movflags="+faststart",
-        r=framerate,
-        **{
-            "metadata:s:a:0": "language=eng",
-        },
+        v1, a1, tmp_file, r=framerate, **{**AV1_NVENC_ARGS, **extra_args}
     )
 
 
-def codec_x264(v1, a1, tmp_file, framerate):
+X264_ARGS = {
+    "format": "mp4",
+    "pix_fmt": "yuv420p10le",
+    "vcodec": "libx264",
+    "g": "600",
+    "preset": "slow",
+    "crf": "20",
+    "vprofile": "high10",
+    "acodec": "libfdk_aac",
+    "audio_bitrate": "128k",
+    "movflags": "+faststart",
+    "metadata:s:a:0": "language=eng",
+}
+
+
+def codec_x264(v1, a1, tmp_file, framerate, **extra_args):
     """Use CPU encoding to encode to H.264"""
-    return ffmpeg.output(
-        v1,
-        a1,
-        tmp_file,
-        format="mp4",
-        pix_fmt="yuv420p10le",
-        vcodec="x264",
-        g="600",
-        preset="slow",
-        cq="20",
-        vprofile="main10",
-        acodec="libfdk_aac",
-        audio_bitrate="128k",
-        movflags="+faststart",
-        r=framerate,
-        **{
-            "metadata:s:a:0": "language=eng",
-        },
-    )
+    return ffmpeg.output(v1, a1, tmp_file, r=framerate, **{**X264_ARGS, **extra_args})
+
+
+X265_ARGS = {
+    "format": "mp4",
+    "pix_fmt": "yuv420p10le",
+    "vcodec": "libx265",
+    "tune": "fastdecode",
+    "preset": "fast",
+    "crf": "18",
+    "g": "600",
+    "bufsize": "25M",
+    "maxrate": "10M",
+    "vprofile": "main10",
+    "vtag": "hvc1",
+    "acodec": "libfdk_aac",
+    "audio_bitrate": "128k",
+    "movflags": "+faststart",
+    "metadata:s:a:0": "language=eng",
+}
 
 
-def codec_x265(v1, a1, tmp_file, framerate):
+def codec_x265(v1, a1, tmp_file, framerate, **extra_args):
     """Use CPU encoding to encode to H.265"""
+    return ffmpeg.output(v1, a1, tmp_file, r=framerate, **{**X265_ARGS, **extra_args})
+
+
+SVT_HEVC_ARGS = {
+    "format": "mp4",
+    "pix_fmt": "yuv420p10le",
+    "vcodec": "libsvt_hevc",
+    "preset": "7",
+    "rc": "0",
+    "qp": "24",
+    "g": "600",
+    "forced-idr": "1",
+    "vtag": "hvc1",
+    "acodec": "libfdk_aac",
+    "audio_bitrate": "128k",
+    "movflags": "+faststart",
+    "metadata:s:a:0": "language=eng",
+}
+
+
+def codec_svt_hevc(v1, a1, tmp_file, framerate, **extra_args):
+    """Use SVT-HEVC CPU encoding to encode to H.265; needs an SVT-HEVC patched ffmpeg"""
     return ffmpeg.output(
-        v1,
-        a1,
-        tmp_file,
-        format="mp4",
-        pix_fmt="yuv420p10le",
-        vcodec="libx265",
-        tune="fastdecode",
-        preset="medium",
-        crf="18",
-        g="600",
-        bufsize="25M",
-        maxrate="10M",
-        vprofile="main10",
-        vtag="hvc1",
-        acodec="libfdk_aac",
-        audio_bitrate="128k",
-        movflags="+faststart",
-        r=framerate,
-        **{
-            "metadata:s:a:0": "language=eng",
-        },
+        v1, a1, tmp_file, r=framerate, **{**SVT_HEVC_ARGS, **extra_args}
     )
 
 
-def codec_av1(v1, a1, tmp_file, framerate):
+AV1_ARGS = {
+    "format": "mp4",
+    "pix_fmt": "yuv420p10le",
+    "vcodec": "libsvtav1",
+    "preset": 6,
+    "crf": 30,
+    "acodec": "libfdk_aac",
+    "audio_bitrate": "128k",
+    "movflags": "+faststart",
+    "metadata:s:a:0": "language=eng",
+    "svtav1-params": "fast-decode=1:enable-overlays=1:lookahead=0:scd=1:enable-qm=1",
+}
+
+
+def codec_av1(v1, a1, tmp_file, framerate, **extra_args):
     """Use CPU encoding to encode to AV1"""
-    return ffmpeg.output(
-        v1,
-        a1,
-        tmp_file,
-        format="mp4",
-        pix_fmt="yuv420p10le",
-        vcodec="libsvtav1",
-        preset=4,
-        crf=30,
-        acodec="libfdk_aac",
-        audio_bitrate="128k",
-        movflags="+faststart",
-        r=framerate,
-        **{
-            "metadata:s:a:0": "language=eng",
-            "svtav1-params": "fast-decode=1:enable-overlays=1:lookahead=0:scd=1:enable-qm=1",
-        },
-    )
+    return ffmpeg.output(v1, a1, tmp_file, r=framerate, **{**AV1_ARGS, **extra_args})
+
+
+HEVC_MAC_ARGS = {
+    "format": "mp4",
+    "pix_fmt": "p010le",
+    "vcodec": "hevc_videotoolbox",
+    "vprofile": "main10",
+    "vtag": "hvc1",
+    "acodec": "aac_at",
+    "audio_bitrate": "128k",
+    "movflags": "+faststart",
+    "q:v": "70",
+    "metadata:s:a:0": "language=eng",
+}
 
-def codec_hevc_mac(v1, a1, tmp_file, framerate):
+
+def codec_hevc_mac(v1, a1, tmp_file, framerate, **extra_args):
     """Use VideoToolbox encoding to encode to H.265"""
     return ffmpeg.output(
-        v1,
-        a1,
-        tmp_file,
-        format="mp4",
-        pix_fmt="p010le",
-        vcodec="hevc_videotoolbox",
-        vprofile="main10",
-        vtag="hvc1",
-        acodec="aac_at",
-        audio_bitrate="128k",
-        movflags="+faststart",
-        r=framerate,
-        **{
-            "q:v": "70",
-            "metadata:s:a:0": "language=eng",
-        },
+        v1, a1, tmp_file, r=framerate, **{**HEVC_MAC_ARGS, **extra_args}
     )
 
 
+REMUX_ARGS = {
+    "format": "mp4",
+    "vcodec": "copy",
+    "acodec": "copy",
+    "movflags": "+faststart",
+    "metadata:s:a:0": "language=eng",
+}
+
+
+def codec_remux(v1, a1, tmp_file):
+    """Copy the streams into an MP4 untouched"""
+    return ffmpeg.output(v1, a1, tmp_file, **REMUX_ARGS)
+
+
 CODECS = {
     "x264": codec_x264,
     "x265": codec_x265,
+    "svt_hevc": codec_svt_hevc,
     "av1": codec_av1,
     "hevc_nvenc": codec_hevc_nvenc,
     "av1_nvenc": codec_av1_nvenc,
@@ -210,45 +291,186 @@ CODECS = {
     "hevc_mac": codec_hevc_mac,
 }
 
+# The output options behind each codec
+CODEC_ARGS = {
+    "x264": X264_ARGS,
+    "x265": X265_ARGS,
+    "svt_hevc": SVT_HEVC_ARGS,
+    "av1": AV1_ARGS,
+    "hevc_nvenc": HEVC_NVENC_ARGS,
+    "av1_nvenc": AV1_NVENC_ARGS,
+    "hevc_qsv": HEVC_QSV_ARGS,
+    "hevc_mac": HEVC_MAC_ARGS,
+}
+# Audio and container options that the encoder test frame has no use for
+ENCODER_TEST_SKIPPED_ARGS = {
+    "format",
+    "acodec",
+    "audio_bitrate",
+    "movflags",
+    "metadata:s:a:0",
+}
+
+# The ffmpeg video and audio encoders each codec needs
+CODEC_ENCODERS = {
+    label: (args["vcodec"], args["acodec"]) for label, args in CODEC_ARGS.items()
+}
+
 
-def get_height_and_width(filename):
-    """Calculate the height of the video"""
+@functools.lru_cache(maxsize=None)
+def get_available_encoders():
+    """List the encoders the installed ffmpeg was built with"""
     try:
-        probe = ffmpeg.probe("./" + filename)
-        video_stream = next(
-            (stream for stream in probe["streams"] if stream["codec_type"] == "video"),
-            None,
+        encoder_list = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return set()
+    # Encoder lines look like " V....D hevc_nvenc    NVIDIA NVENC hevc encoder"
+    return {
+        fields[1]
+        for fields in map(str.split, encoder_list.splitlines())
+        if len(fields) > 1 and len(fields[0]) == 6
+    }
+
+
+# What --codec auto tries, fastest first; x265 is the CPU fallback
+AUTO_CODEC_PREFERENCE = ["hevc_nvenc", "hevc_qsv", "hevc_mac", "x265"]
+
+
+@functools.lru_cache(maxsize=None)
+def detect_best_codec():
+    """Pick the fastest H.265 codec whose encoders actually run on this machine"""
+    for codec in AUTO_CODEC_PREFERENCE:
+        _, audio_encoder = CODEC_ENCODERS[codec]
+        if audio_encoder in get_available_encoders() and encoder_works(codec):
+            return codec
+    return AUTO_CODEC_PREFERENCE[-1]
+
+
+@functools.lru_cache(maxsize=None)
+def encoder_works(codec_label):
+    """Encode a test frame with the codec's own options to prove this machine can"""
+    # ffmpeg lists hardware encoders it has no device for, and NVENC rejects
+    # options such as B-frames that the card doesn't support
+    video_args = {
+        key: value
+        for key, value in CODEC_ARGS[codec_label].items()
+        if key not in ENCODER_TEST_SKIPPED_ARGS
+    }
+    if video_args["vcodec"] not in get_available_encoders():
+        return False
+    try:
+        (
+            ffmpeg.input("color=size=256x256:duration=0.1,format=p010le", f="lavfi")
+            .output("-", format="null", vframes=1, **video_args)
+            .global_args("-hide_banner", "-nostdin")
+            .run(capture_stdout=True, capture_stderr=True)
         )
-        height = int(video_stream["height"])
-        width = int(video_stream["width"])
-        return height, width
-    except ffmpeg.Error as err:
-        print(err.stderr)
-        raise err
-
-
-def get_frame_rate(filename):
-    """Calculates the total framerate so we can use a framerate less than MAX_FRAMERATE"""
-    probe = ffmpeg.probe("./" + filename)
-    video_stream = next(
-        (stream for stream in probe["streams"] if stream["codec_type"] == "video"), None
-    )
-    fps = eval(video_stream["r_frame_rate"])
-    return float(fps)
+    except (OSError, ffmpeg.Error):
+        return False
+    return True
 
 
-def get_total_duration(filename):
-    """Calculates the total duration, for logging purposes."""
+@functools.lru_cache(maxsize=None)
+def get_gpu_count():
+    """Count the NVIDIA GPUs so NVENC jobs can be spread across all of them"""
+    try:
+        gpu_list = subprocess.run(
+            ["nvidia-smi", "-L"], capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return 1
+    # Product names such as "... Laptop GPU" also contain "GPU", so only count
+    # the lines that list a device
+    return max(1, sum(line.startswith("GPU ") for line in gpu_list.splitlines()))
+
+
+def default_encode_jobs(codec_label):
+    """Pick how many encodes to run at once when --jobs isn't given"""
+    if codec_label in CPU_CODECS:
+        return max(1, (os.cpu_count() or 1) // CPU_CORES_PER_ENCODE)
+    if codec_label in NVENC_CODECS:
+        return NVENC_SESSIONS_PER_GPU * get_gpu_count()
+    return DEFAULT_ENCODE_JOBS
+
+
+def load_json_cache(path):
+    """Load a JSON cache file, starting empty if it is missing or unreadable."""
     try:
-        probe = ffmpeg.probe("./" + filename)
+        with open(path, encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json_cache(path, cache):
+    """Atomically rewrite a JSON cache file."""
+    with tempfile.NamedTemporaryFile(
+        "w", dir=os.path.dirname(os.path.abspath(path)), delete=False, encoding="utf-8"
+    ) as cache_file:
+        json.dump(cache, cache_file)
+    os.replace(cache_file.name, path)
+
+
+probe_cache = load_json_cache(PROBE_CACHE_PATH)
+sponsor_cache = load_json_cache(SPONSOR_CACHE_PATH)
+dearrow_cache = load_json_cache(DEARROW_CACHE_PATH)
+
+
+def probe_video(filename):
+    """Probe the video once for its size, duration, framerate and audio codec."""
+    file_stat = os.stat(filename)
+    cache_key = os.path.abspath(filename)
+    cached = probe_cache.get(cache_key)
+    if (
+        cached is None
+        or cached["mtime_ns"] != file_stat.st_mtime_ns
+        or cached["size"] != file_stat.st_size
+        or "audio_codec" not in cached
+    ):
+        try:
+            probe = ffmpeg.probe(filename)
+        except ffmpeg.Error as err:
+            print(err.stderr)
+            raise err
         video_stream = next(
             (stream for stream in probe["streams"] if stream["codec_type"] == "video"),
             None,
         )
-        return get_sec(video_stream["tags"]["DURATION"])
-    except ffmpeg.Error as err:
-        print(err.stderr)
-        raise err
+        audio_stream = next(
+            (stream for stream in probe["streams"] if stream["codec_type"] == "audio"),
+            {},
+        )
+        cached = {
+            "mtime_ns": file_stat.st_mtime_ns,
+            "size": file_stat.st_size,
+            "height": int(video_stream["height"]),
+            "width": int(video_stream["width"]),
+            "duration": get_sec(video_stream["tags"]["DURATION"]),
+            "fps": get_frame_rate(video_stream),
+            "audio_codec": audio_stream.get("codec_name"),
+        }
+        probe_cache[cache_key] = cached
+    return (
+        cached["height"],
+        cached["width"],
+        cached["duration"],
+        Fraction(cached["fps"]),
+        cached["audio_codec"],
+    )
+
+
+def get_frame_rate(video_stream):
+    """Pick ffprobe's frame rate, skipping the "0/0" it reports when it doesn't know"""
+    for key in ("r_frame_rate", "avg_frame_rate"):
+        numerator, _, denominator = video_stream.get(key, "0/0").partition("/")
+        if int(numerator) != 0 and int(denominator or 1) != 0:
+            return f"{numerator}/{denominator or 1}"
+    return str(MAX_INPUT_FRAME_RATE)
 
 
 def get_sec(time_str):
@@ -257,47 +479,135 @@ def get_sec(time_str):
     return int(h) * 3600 + int(m) * 60 + float(s)
 
 
-def download_videos(videos, opts, dearrow_enabled, retries_remaining):
-    """Downloads the videos and also fetches their titles"""
-    result_list = []
-    if retries_remaining < 1:
-        print("no more retries left. aborting.")
-        return result_list
-
-    with yt_dlp.YoutubeDL(opts) as ydl:
-        for url in videos:
-            try:
-                extracted_info = ydl.extract_info(url)
-                if (
-                    "_type" in extracted_info
-                    and "entries" in extracted_info
-                    and extracted_info["_type"] == "playlist"
-                ):
-                    for entry in [
-                        x for x in extracted_info["entries"] if x is not None
-                    ]:
-                        result_list.append(
-                            parse_video_info_for_filename(entry, dearrow_enabled)
-                        )
-                else:
-                    result_list.append(
-                        parse_video_info_for_filename(extracted_info, dearrow_enabled)
+def flat_video_entry(url):
+    """Turn a URL yt-dlp knows is a single video into an entry, without any requests"""
+    ie = next(
+        (ie for ie in yt_dlp.extractor.gen_extractor_classes() if ie.suitable(url)),
+        None,
+    )
+    if ie is None or not ie.is_single_video(url):
+        return None
+    video_id = ie.get_temp_id(url)
+    if video_id is None:
+        return None
+    return {"_type": "url", "url": url, "ie_key": ie.ie_key(), "id": video_id}
+
+
+def extract_video_info(url, opts):
+    """List a URL's entries without resolving them, on a YoutubeDL of its own"""
+    with yt_dlp.YoutubeDL({**opts, "extract_flat": "in_playlist"}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if info.get("_type") == "playlist":
+        return info
+    # Stream URLs expire, so a single video is resolved again when it downloads
+    return {
+        "_type": "url",
+        "url": url,
+        "id": info["id"],
+        "title": info.get("title"),
+        "uploader": info.get("uploader"),
+    }
+
+
+def download_videos(videos, opts, dearrow_enabled, max_attempts):
+    """Downloads the videos and also fetches their titles, yielding each as it lands"""
+    pending = list(videos)
+    downloaded_ids = set()
+    with yt_dlp.YoutubeDL(opts) as ydl, ThreadPoolExecutor(
+        max_workers=HTTP_WORKERS
+    ) as executor:
+        for retries_remaining in range(max_attempts - 1, -1, -1):
+            failed = []
+            # Only playlists are listed in parallel up front; every video,
+            # whether on its own or in a playlist, is resolved as it downloads
+            flat_entries = [flat_video_entry(url) for url in pending]
+            extracted_infos = [
+                None if flat_entry else executor.submit(extract_video_info, url, opts)
+                for url, flat_entry in zip(pending, flat_entries)
+            ]
+            for url, flat_entry, extracted_info in zip(
+                pending, flat_entries, extracted_infos
+            ):
+                try:
+                    # Resolve the entries first so each video can be handed to the
+                    # encoder as soon as it lands, not after the whole playlist
+                    extracted_info = flat_entry or extracted_info.result()
+                    if (
+                        "_type" in extracted_info
+                        and "entries" in extracted_info
+                        and extracted_info["_type"] == "playlist"
+                    ):
+                        entries = [
+                            x for x in extracted_info["entries"] if x is not None
+                        ]
+                    else:
+                        entries = [extracted_info]
+
+                    # Warm the DeArrow and SponsorBlock caches while the videos
+                    # download so neither lookup waits on the network later
+                    for entry in entries:
+                        if dearrow_enabled:
+                            executor.submit(fetch_dearrowed_title, entry["id"])
+                        executor.submit(fetch_sponsored_bits, entry["id"])
+                    for entry in entries:
+                        if entry["id"] in downloaded_ids:
+                            continue
+                        if not os.path.exists(entry["id"] + ".mkv"):
+                            entry = ydl.process_ie_result(entry, download=True)
+                        elif (
+                            entry.get("title") is None or entry.get("uploader") is None
+                        ):
+                            # Left over from an earlier run, but a flat playlist
+                            # entry may still lack what the file name needs
+                            entry = ydl.process_ie_result(entry, download=False)
+                        if entry is None:
+                            # ignoreerrors hands back None for a failed video; keep
+                            # going through the playlist and retry the URL later
+                            print(
+                                f"failed to download {url}\n"
+                                f"retries left: {retries_remaining}"
+                            )
+                            if url not in failed:
+                                failed.append(url)
+                            continue
+                        downloaded_ids.add(entry["id"])
+                        yield parse_video_info_for_filename(entry, dearrow_enabled)
+                except Exception as exception_during_download:
+                    print(exception_during_download)
+                    print(
+                        f"failed to download {url}\nretries left: {retries_remaining}"
                     )
-            except KeyboardInterrupt:
-                print("\n!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-                print("keyboard interrupt, aborting")
-                print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-                exit()
-            except Exception as exception_during_download:
-                print(exception_during_download)
-                print(
-                    f"failed to download {url}\nretries left: {retries_remaining - 1}"
-                )
-                return download_videos(
-                    videos, opts, dearrow_enabled, retries_remaining - 1
+                    if url not in failed:
+                        failed.append(url)
+
+            # Only the URLs that failed are retried, reusing the same YoutubeDL
+            pending = failed
+            if not pending:
+                return
+            if retries_remaining:
+                # Back off exponentially so a throttled session can recover
+                time.sleep(
+                    RETRY_BACKOFF_SECONDS * 2 ** (max_attempts - 1 - retries_remaining)
                 )
 
-    return result_list
+    print("no more retries left. aborting.")
+
+
+def download_in_background(videos, opts, dearrow_enabled):
+    """Run the downloads on their own thread so encoding can start on the first video"""
+    downloaded = queue.Queue()
+
+    def producer():
+        try:
+            for video in download_videos(videos, opts, dearrow_enabled, MAX_RETRIES):
+                downloaded.put(video)
+        finally:
+            download_lock.release()
+            downloaded.put(None)
+
+    threading.Thread(target=producer, daemon=True).start()
+    while (video := downloaded.get()) is not None:
+        yield video
 
 
 def parse_video_info_for_filename(entry, dearrow_enabled):
@@ -309,7 +619,7 @@ def parse_video_info_for_filename(entry, dearrow_enabled):
         if dearrow_title is not None:
             video_title = dearrow_title
     uploader = entry["uploader"]
-    filename = allowed_chars_pattern.sub("", f"{uploader} - {video_title}")
+    filename = f"{uploader} - {video_title}".translate(filename_char_table)
     filename = ' '.join(filename.split())
     print(f'Setting "{filename}" as file name for {video_id}')
     return video_id, filename
@@ -317,14 +627,16 @@ def parse_video_info_for_filename(entry, dearrow_enabled):
 
 def fetch_dearrowed_title(video_id):
     """Fetches a new title from DeArrow that is potentially less  clickbait-y"""
-    payload = f"videoID={video_id}"
     try:
-        r = requests.get(
-            "https://sponsor.ajay.app/api/branding", params=payload, timeout=10
+        data = json.loads(
+            fetch_cached(
+                dearrow_cache,
+                video_id,
+                "https://sponsor.ajay.app/api/branding",
+                {"videoID": video_id},
+            )
         )
 
-        data = json.loads(r.text)
-
         # Initialize max_votes to -1 and most_voted_title to None
         max_votes = -1
         most_voted_title = None
@@ -347,23 +659,52 @@ def fetch_dearrowed_title(video_id):
 
 def fetch_sponsored_bits(video_id):
     """Query the SponsorBlock service to find out if any segments should be omitted."""
-    categories_string = str(BLOCKED_CATEGORIES).replace("'", '"')
-    payload = f"videoID={video_id}&categories={categories_string}"
     try:
-        r = requests.get(
-            "https://sponsor.ajay.app/api/skipSegments", params=payload, timeout=10
+        return fetch_cached(
+            sponsor_cache,
+            video_id,
+            "https://sponsor.ajay.app/api/skipSegments",
+            {"videoID": video_id, "categories": BLOCKED_CATEGORIES_JSON},
         )
-        output = r.text
-        return output
     except requests.exceptions.ReadTimeout as timeout_error:
         print(timeout_error)
         return "Not Found"
 
 
-def add_sponsor_video_filter(video_stream, audio_stream, video_id, total_duration):
-    """Add an FFMPEG filter that slices out the sponsored segments"""
-    sponsored_segment_response = fetch_sponsored_bits(video_id)
+def fetch_cached(cache, video_id, url, params):
+    """GET a per-video API response, reusing the cached body while it is fresh"""
+    cached = cache.get(video_id)
+    if cached is not None and time.time() - cached["fetched"] < API_CACHE_TTL:
+        return cached["body"]
+
+    headers = {}
+    if cached is not None and cached["etag"] is not None:
+        headers["If-None-Match"] = cached["etag"]
+    try:
+        r = SESSION.get(url, params=params, headers=headers, timeout=10)
+    except requests.exceptions.ReadTimeout as timeout_error:
+        if cached is None:
+            raise timeout_error
+        print(timeout_error)
+        return cached["body"]
 
+    if r.status_code == 304:
+        output = cached["body"]
+    else:
+        output = r.text
+    if r.status_code in (200, 304, 404):
+        cache[video_id] = {
+            "etag": r.headers.get("ETag"),
+            "body": output,
+            "fetched": time.time(),
+        }
+    return output
+
+
+def add_sponsor_video_filter(
+    video_stream, audio_stream, video_id, sponsored_segment_response, total_duration
+):
+    """Add an FFMPEG filter that slices out the sponsored segments"""
     if sponsored_segment_response == "Not Found":
         print(f"No sponsored segments for {video_id}.")
         return video_stream, audio_stream
@@ -388,40 +729,22 @@ def add_sponsor_video_filter(video_stream, audio_stream, video_id, total_duratio
             return video_stream, audio_stream
 
 
+def select_expression(segments_to_keep):
+    """Build the select expression that is true only inside the kept segments."""
+    return "+".join(f"between(t,{start},{end})" for start, end in segments_to_keep)
+
+
 def trim_video(video_stream, segments_to_keep):
     """Construct the video filter that slices out the undesired segments."""
-    streams_to_concat = []
-    split_streams = video_stream.filter_multi_output("split", len(segments_to_keep))
-    for i, segment in enumerate(segments_to_keep):
-        trimmed_stream = (
-            split_streams[i]
-            .trim(start=segment[0], end=segment[1])
-            .setpts("PTS-STARTPTS")
-        )
-        streams_to_concat.append(trimmed_stream)
-    return ffmpeg.concat(
-        *streams_to_concat,
-        n=len(streams_to_concat),
+    return video_stream.filter("select", select_expression(segments_to_keep)).setpts(
+        "N/FRAME_RATE/TB"
     )
 
 
 def trim_audio(audio_stream, segments_to_keep):
     """Construct the audio filter that slices out the undesired segments."""
-    streams_to_concat = []
-    split_streams = audio_stream.filter_multi_output("asplit", len(segments_to_keep))
-    for i, segment in enumerate(segments_to_keep):
-        trimmed_stream = (
-            split_streams[i]
-            .filter("atrim", start=segment[0], end=segment[1])
-            .filter("asetpts", "PTS-STARTPTS")
-        )
-        streams_to_concat.append(trimmed_stream)
-
-    return ffmpeg.concat(
-        *streams_to_concat,
-        n=len(streams_to_concat),
-        v=0,
-        a=1,
+    return audio_stream.filter("aselect", select_expression(segments_to_keep)).filter(
+        "asetpts", "N/SR/TB"
     )
 
 
@@ -429,47 +752,91 @@ def find_worthwhile_clips(segments, total_duration):
     """Parse the SponsorBlock info to get only the desired segments."""
     output = []
     start = 0.0
-    for unwanted_segment in sorted([x["segment"] for x in segments]):
-        segment_start = unwanted_segment[0]
-        segment_end = unwanted_segment[1]
+    for segment in sorted(segments, key=lambda x: x["segment"]):
+        segment_start, segment_end = segment["segment"]
+        if segment_end <= segment_start:
+            # Zero-length segments would only split a kept clip in two
+            continue
         if segment_start > start:
             output.append((start, segment_start))
-        start = segment_end
+        # A segment nested inside an earlier one must not move start backwards
+        start = max(start, segment_end)
 
     if start < total_duration:
         output.append((start, total_duration))
     return output
 
 
-def encode_videos(downloaded_videos, codec_label):
-    """Iterate through the videos and invoke ffmpeg to encode them."""
-    existing_mkv_files = glob.glob("*.mkv")
-    existing_mp4_files = glob.glob("*.mp4")
-
-    for display_id, file_name_root in downloaded_videos:
-        in_file_name = display_id + ".mkv"
-        if in_file_name in existing_mkv_files:
-            existing_mkv_files.remove(in_file_name)
-        out_file_suffix = f"_{display_id}.mp4"
-        existing_file = next(glob.iglob("*" + out_file_suffix), None)
-        if existing_file:
-            print(f"{existing_file} already exists, skipping")
-            existing_mp4_files.remove(existing_file)
-            continue
-
-        destination_file = file_name_root + out_file_suffix
+def encode_video(display_id, file_name_root, codec_label, gpu_id):
+    """Invoke ffmpeg to encode a single downloaded video."""
+    # The "./" keeps IDs that start with "-" from being read as ffmpeg options
+    in_file_name = f"./{display_id}.mkv"
+    out_file_suffix = f"_{display_id}.mp4"
+    destination_file = file_name_root + out_file_suffix
 
-        new_height, new_width = get_height_and_width(in_file_name)
-
-        input_object = ffmpeg.input("./" + in_file_name)
-
-        total_length = get_total_duration(in_file_name)
+    new_height, new_width, total_length, input_framerate, audio_codec = probe_video(
+        in_file_name
+    )
 
-        v1 = input_object["v"]
-        a1 = input_object["a"]
-        v1, a1 = add_sponsor_video_filter(v1, a1, display_id, total_length)
-        v1 = v1.setpts("PTS/%s" % SPEED_FACTOR)
-        if new_height > MAX_HEIGHT or new_width > MAX_WIDTH:
+    input_args = {}
+    output_args = {}
+    # Several encodes share the terminal, so ffmpeg only reports errors
+    global_args = ["-hide_banner", "-nostdin", "-nostats", "-loglevel", "error"]
+    if codec_label in NVENC_CODECS:
+        # Decode with NVDEC on the same card that will run NVENC and keep the
+        # frames in VRAM; select and setpts only touch timestamps. The filters
+        # share that card through the named device
+        global_args += [
+            "-init_hw_device",
+            f"cuda=gpu:{gpu_id}",
+            "-filter_hw_device",
+            "gpu",
+        ]
+        input_args = {
+            "hwaccel": "cuda",
+            "hwaccel_output_format": "cuda",
+            "hwaccel_device": "gpu",
+        }
+        output_args = {"gpu": gpu_id}
+
+    input_object = ffmpeg.input(in_file_name, **input_args)
+
+    sponsored_segment_response = fetch_sponsored_bits(display_id)
+
+    source_video = v1 = input_object["v"]
+    source_audio = a1 = input_object["a"]
+    v1, a1 = add_sponsor_video_filter(
+        v1, a1, display_id, sponsored_segment_response, total_length
+    )
+    needs_scaling = new_height > MAX_HEIGHT or new_width > MAX_WIDTH
+    temp_file_name = f"./{display_id}.tmp"
+
+    if (
+        SPEED_FACTOR == 1
+        and v1 is source_video
+        and not needs_scaling
+        and input_framerate <= MAX_OUTPUT_FRAME_RATE
+    ):
+        # Nothing would change the video or audio, so a remux does the job
+        output = codec_remux(v1, a1, temp_file_name)
+    else:
+        if SPEED_FACTOR != 1:
+            v1 = v1.setpts("PTS/%s" % SPEED_FACTOR)
+        if codec_label in NVENC_CODECS:
+            # hwupload hands NVDEC's CUDA frames straight to scale_cuda and only
+            # uploads frames that fell back to software decoding, e.g. a codec
+            # this card can't decode; hwupload_cuda would reject CUDA frames
+            v1 = v1.filter("hwupload")
+            scale_args = {"format": "p010le"}
+            if needs_scaling:
+                scale_args.update(
+                    w=MAX_WIDTH,
+                    h=MAX_HEIGHT,
+                    force_original_aspect_ratio="decrease",
+                    force_divisible_by=2,
+                )
+            v1 = v1.filter("scale_cuda", **scale_args)
+        elif needs_scaling:
             v1 = v1.filter(
                 "scale",
                 MAX_WIDTH,
@@ -477,101 +844,251 @@ def encode_videos(downloaded_videos, codec_label):
                 force_original_aspect_ratio="decrease",
                 force_divisible_by=2,
             )
-        a1 = a1.filter("atempo", SPEED_FACTOR)
-
-        temp_file_name = "./" + display_id + ".tmp"
-
-        output_framerate = min(
-            SPEED_FACTOR * get_frame_rate(in_file_name), MAX_OUTPUT_FRAME_RATE
+        if SPEED_FACTOR != 1:
+            a1 = a1.filter("atempo", SPEED_FACTOR)
+        if a1 is source_audio and audio_codec == "aac":
+            # No filter touches the audio, so the source AAC can go in as-is
+            output_args["acodec"] = "copy"
+
+        # Keep the rate rational so e.g. 60000/1001 reaches ffmpeg without rounding
+        output_framerate = str(
+            min(
+                Fraction(SPEED_FACTOR).limit_denominator() * input_framerate,
+                MAX_OUTPUT_FRAME_RATE,
+            )
         )
-        start = datetime.now()
+        output = CODECS[codec_label](
+            v1, a1, temp_file_name, output_framerate, **output_args
+        )
+
+    start = datetime.now()
+    print("%s encoding %s" % (start.strftime("[%Y-%m-%d %H:%M:%S]"), file_name_root))
+    try:
+        output.global_args(*global_args).run(overwrite_output=True)
+        end = datetime.now()
+        duration = end - start
         print(
-            "%s encoding %s" % (start.strftime("[%Y-%m-%d %H:%M:%S]"), file_name_root)
+            "%s completed %s encoding in %s"
+            % (end.strftime("[%Y-%m-%d %H:%M:%S]"), file_name_root, duration)
         )
+        os.replace(temp_file_name, destination_file)
+    except ffmpeg._run.Error:
+        print(f"Error running ffmpeg on {out_file_suffix}!")
+        Path(temp_file_name).unlink(missing_ok=True)
+        Path(f"ERROR_ENCODING_FILE{out_file_suffix}").touch()
+    except OSError as error:
+        print(f"Couldn't save {destination_file}: {error}")
+        Path(temp_file_name).unlink(missing_ok=True)
+
+
+def encode_video_on_gpu(display_id, file_name_root, codec_label, gpu_count):
+    """Encode on whichever GPU has the fewest jobs running when this one starts"""
+    with gpu_lock:
+        gpu_id = min(range(gpu_count), key=gpu_job_counts.__getitem__)
+        gpu_job_counts[gpu_id] += 1
+    try:
+        encode_video(display_id, file_name_root, codec_label, gpu_id)
+    finally:
+        with gpu_lock:
+            gpu_job_counts[gpu_id] -= 1
+
+
+def encode_videos(downloaded_videos, codec_label, max_jobs):
+    """Iterate through the videos and run up to max_jobs ffmpeg encodes at once."""
+    # One directory scan up front; the per-video checks below only touch these sets
+    with os.scandir(".") as directory:
+        existing_files = {
+            entry.name
+            for entry in directory
+            if entry.is_file() and not entry.name.startswith(".")
+        }
+    existing_mkv_files = {name for name in existing_files if name.endswith(".mkv")}
+    existing_mp4_files = {name for name in existing_files if name.endswith(".mp4")}
+    gpu_count = get_gpu_count() if codec_label in NVENC_CODECS else 1
+
+    # downloaded_videos may still be downloading, so each video is submitted
+    # as soon as it arrives rather than after the whole batch
+    with ThreadPoolExecutor(max_workers=max_jobs) as executor:
         try:
-            codec = CODECS[codec_label]
-            out, err = (
-                codec(v1, a1, temp_file_name, output_framerate)
-                .global_args("-hide_banner", "-nostdin")
-                .run(overwrite_output=True)
-            )
-            print(f"Output: {out}")
-            print(f"Error: {err}")
-            end = datetime.now()
-            duration = end - start
-            if os.path.isfile(temp_file_name):
-                print(
-                    "%s completed %s encoding in %s"
-                    % (end.strftime("[%Y-%m-%d %H:%M:%S]"), file_name_root, duration)
+            futures = {}
+            for display_id, file_name_root in downloaded_videos:
+                existing_mkv_files.discard(display_id + ".mkv")
+                out_file_suffix = f"_{display_id}.mp4"
+                existing_file = next(
+                    (
+                        name
+                        for name in existing_mp4_files
+                        if name.endswith(out_file_suffix)
+                    ),
+                    None,
                 )
-                os.rename(temp_file_name, destination_file)
-            if os.path.isfile(destination_file):
-                print("%s rename successful" % destination_file)
-            else:
-                print("%s rename failed" % destination_file)
-                print(
-                    temp_file_name + " still exists: " + os.path.isfile(temp_file_name)
+                if existing_file:
+                    print(f"{existing_file} already exists, skipping")
+                    existing_mp4_files.discard(existing_file)
+                    continue
+
+                future = executor.submit(
+                    encode_video_on_gpu,
+                    display_id,
+                    file_name_root,
+                    codec_label,
+                    gpu_count,
                 )
-        except ffmpeg._run.Error:
-            print(f"Error running ffmpeg on {out_file_suffix}!")
-            os.remove(temp_file_name)
-            Path(f"ERROR_ENCODING_FILE{out_file_suffix}").touch()
-            continue
+                futures[future] = display_id
+
+            # One failed encode shouldn't stop the rest, the cleanup or the cache saves
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as error:
+                    print(f"Encoding {futures[future]} failed: {error}")
+        except KeyboardInterrupt:
+            # Leaving the with block would otherwise start every queued encode
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    # Issue the unlinks side by side rather than waiting on each in turn
+    with ThreadPoolExecutor(max_workers=HTTP_WORKERS) as executor:
+        for _ in executor.map(
+            lambda name: Path(name).unlink(missing_ok=True),
+            [*existing_mkv_files, *existing_mp4_files, *glob.glob("*.tmp")],
+        ):
+            pass
+
+
+def save_probe_cache():
+    """Save the ffprobe results for files still on disk"""
+    save_json_cache(
+        PROBE_CACHE_PATH,
+        {path: info for path, info in probe_cache.items() if os.path.exists(path)},
+    )
 
-    for outdated_file in existing_mkv_files + existing_mp4_files:
-        os.remove(outdated_file)
 
-    for leftover_tmp_file in glob.glob("*.tmp"):
-        os.remove(leftover_tmp_file)
+def save_api_caches():
+    """Save the SponsorBlock and DeArrow responses for videos still on disk"""
+    for cache_path, cache in (
+        (SPONSOR_CACHE_PATH, sponsor_cache),
+        (DEARROW_CACHE_PATH, dearrow_cache),
+    ):
+        save_json_cache(
+            cache_path,
+            {
+                video_id: response
+                for video_id, response in cache.items()
+                if os.path.exists(video_id + ".mkv")
+            },
+        )
 
 
-def main(urls, codec, dearrow_enabled):
+def main(urls, codec, dearrow_enabled, max_jobs):
     """The glue that downloads the files then encodes them."""
+    if codec == "auto":
+        codec = detect_best_codec()
+        print(f"Using the {codec} codec.")
     if codec not in CODECS:
         print(f"Invalid codec {codec} specified. Must be one of:")
-        for valid_codec in CODECS:
+        for valid_codec in ["auto", *CODECS]:
             print(f"\t{valid_codec}")
         exit()
 
+    missing_encoders = [
+        encoder
+        for encoder in CODEC_ENCODERS[codec]
+        if encoder not in get_available_encoders()
+    ]
+    if missing_encoders:
+        print(
+            f"ffmpeg has no {', '.join(missing_encoders)} encoder, needed by {codec}."
+        )
+        exit()
+    # An explicit --codec skipped auto-detect, but its options may still be more
+    # than this card supports, and every encode would fail after downloading
+    if not encoder_works(codec):
+        print(f"{codec} could not encode a test frame here. Try another --codec.")
+        exit()
+
+    if max_jobs is None:
+        max_jobs = default_encode_jobs(codec)
+
     ydl_opts = {
         "format": "bestvideo+bestaudio/best",
         "outtmpl": FILE_NAME_TEMPLATE,
         "restrictfilenames": True,
         "merge_output_format": "mkv",
         "ignoreerrors": True,
+        "concurrent_fragment_downloads": FRAGMENT_DOWNLOAD_THREADS,
     }
 
-    downloaded_videos = []
     timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
     try:
-        with download_lock:
-            print(f"{timestamp} Got download lock.")
-            downloaded_videos = download_videos(
-                urls, ydl_opts, dearrow_enabled, MAX_RETRIES
-            )
+        download_lock.acquire()
+        print(f"{timestamp} Got download lock.")
     except Timeout:
         print(f"{timestamp} Could not get downloading lock. Exiting early.")
         sys.exit()
 
+    # The download thread releases download_lock once it is done
+    downloaded_videos = download_in_background(urls, ydl_opts, dearrow_enabled)
+
     timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
     try:
-        with encode_lock:
-            print(f"{timestamp} Got encoding lock.")
-            encode_videos(downloaded_videos, codec)
+        encode_lock.acquire()
+        encoding = True
+        print(f"{timestamp} Got encoding lock.")
     except Timeout:
-        timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-        print(f"{timestamp} Could not get encoding lock.")
+        encoding = False
+        print(f"{timestamp} Could not get encoding lock. Only downloading.")
+
+    # Ctrl-C has to land here whether this run is encoding or only downloading
+    try:
+        if encoding:
+            encode_videos(downloaded_videos, codec, max_jobs)
+        else:
+            for _ in downloaded_videos:
+                pass
+    except KeyboardInterrupt:
+        print("\n!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+        print("keyboard interrupt, aborting")
+        print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+        exit()
+    finally:
+        # Save whatever this run learned even when it was interrupted or crashed,
+        # but leave the probe cache to whichever run holds the encoding lock
+        save_api_caches()
+        if encoding:
+            save_probe_cache()
+            encode_lock.release()
+
+
+def positive_int(value):
+    """argparse type for counts that have to be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive number")
+    return number
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--codec", default="x265", help="Video encoder to use")
+    parser.add_argument(
+        "--codec",
+        default="auto",
+        help="Video encoder to use, or auto for the fastest one available "
+        "(svt_hevc needs an ffmpeg built with the SVT-HEVC patch)",
+    )
     parser.add_argument(
         "--dearrow",
         default=True,
         action=argparse.BooleanOptionalAction,
         help="Whether to attempt to replace the original titles with crowdsourced titles",
     )
+    parser.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=os.environ.get("YTS_ENCODE_JOBS"),
+        help="Maximum number of ffmpeg encodes to run at the same time "
+        "(default: one per 4 cores for CPU codecs, 3 per GPU for NVENC, otherwise 3)",
+    )
     parser.add_argument("urls", nargs="*", help="yt-dlp compatible URLs or identifiers")
     args = parser.parse_args()
-    main(args.urls, args.codec, args.dearrow)
+    main(args.urls, args.codec, args.dearrow, args.jobs)